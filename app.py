@@ -1,6 +1,17 @@
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
+import numpy as np
 import io
+import csv
+import hashlib
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+PREVIEW_ROWS = 1000  # Rows rendered in result tables
+FLOAT_EXACT_LIMIT = 2 ** 53  # Integers beyond this lose precision as float64
+MAX_CACHED_FILES = 8  # Cached parses, hashes and comparisons kept in memory
 
 def read_csv_safely(file, **kwargs):
     """
@@ -8,60 +19,387 @@ def read_csv_safely(file, **kwargs):
     Returns DataFrame and error message (if any)
     """
     try:
-        # First try to sniff the CSV dialect
-        sample = file.read(1024).decode('utf-8')
-        file.seek(0)  # Reset file pointer
-        
-        # Try different CSV reading options
-        try:
-            df = pd.read_csv(
-                file,
-                on_bad_lines='warn',  # Warn about problematic lines
-                encoding='utf-8',
-                engine='python',  # More flexible but slower engine
-                **kwargs
-            )
-        except Exception as e:
-            # If that fails, try with C engine and error_bad_lines=False
+        # Sniff the delimiter only when none was given
+        if not kwargs.get('sep'):
+            # Sniff past the rows the parser will skip, not the preamble
+            skiprows = kwargs.get('skiprows')
+            for _ in range(skiprows if isinstance(skiprows, int) else 0):
+                file.readline()
+            sample = file.read(4096).decode('utf-8', errors='replace')
             file.seek(0)  # Reset file pointer
-            df = pd.read_csv(
-                file,
-                on_bad_lines='skip',  # Skip problematic lines
-                encoding='utf-8',
-                engine='c',  # Faster engine
-                **kwargs
-            )
+            try:
+                kwargs['sep'] = csv.Sniffer().sniff(sample).delimiter
+            except csv.Error:
+                kwargs['sep'] = ','
+        
+        # Try the engines from fastest to most forgiving. The pyarrow engine is
+        # left out: it ignores skiprows and infers dates, so the same column
+        # could parse differently between files or engines
+        engines = [
+            ('c', 'warn'),  # Fast, compiled tokenizer
+            ('python', 'skip'),  # More flexible but slower engine
+        ]
+        for engine, on_bad_lines in engines:
+            try:
+                df = pd.read_csv(
+                    file,
+                    on_bad_lines=on_bad_lines,
+                    encoding='utf-8',
+                    engine=engine,
+                    dtype_backend='pyarrow',  # Compact Arrow-backed columns
+                    **kwargs
+                )
+                break
+            except (pd.errors.ParserError, ValueError, ImportError):
+                # Unsupported options or malformed input, try the next engine
+                if engine == engines[-1][0]:
+                    raise
+                file.seek(0)  # Reset file pointer
         
         return df, None
     except Exception as e:
         return None, str(e)
 
-def find_unique_records(df1, df2):
+def row_hashes(df):
+    """
+    Hash every row of a DataFrame into a single uint64 value
+    Returns a numpy array with one hash per row
+    """
+    # Arrow integer and boolean columns turn into float or object arrays when
+    # they hold nulls, so hash their values and null mask separately instead
+    columns = {}
+    for column in (df.iloc[:, i] for i in range(len(df.columns))):
+        dtype = column.dtype
+        if isinstance(dtype, pd.ArrowDtype) and (
+            pa.types.is_integer(dtype.pyarrow_dtype)
+            or pa.types.is_boolean(dtype.pyarrow_dtype)
+        ):
+            fill = dtype.numpy_dtype.type(0)
+            columns[len(columns)] = column.to_numpy(dtype.numpy_dtype, na_value=fill)
+            columns[len(columns)] = column.isna().to_numpy()
+        else:
+            columns[len(columns)] = column.array
+    
+    normalized = pd.DataFrame(columns, index=df.index)
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+def is_bool_dtype(dtype):
+    """
+    Check whether a column dtype holds booleans
+    """
+    if isinstance(dtype, pd.ArrowDtype):
+        return pa.types.is_boolean(dtype.pyarrow_dtype)
+    return dtype.kind == 'b'
+
+def is_number_dtype(dtype):
+    """
+    Check whether a column dtype holds booleans, integers or floats
+    """
+    if isinstance(dtype, pd.ArrowDtype):
+        return (
+            pa.types.is_boolean(dtype.pyarrow_dtype)
+            or pa.types.is_integer(dtype.pyarrow_dtype)
+            or pa.types.is_floating(dtype.pyarrow_dtype)
+        )
+    return dtype.kind in 'biuf'
+
+def is_float_dtype(dtype):
+    """
+    Check whether a column dtype holds floats
+    """
+    if isinstance(dtype, pd.ArrowDtype):
+        return pa.types.is_floating(dtype.pyarrow_dtype)
+    return dtype.kind == 'f'
+
+def fits_float(column):
+    """
+    Check that every value of a column is exactly representable as float64
+    """
+    if is_float_dtype(column.dtype) or is_bool_dtype(column.dtype):
+        return True
+    out_of_range = (column > FLOAT_EXACT_LIMIT) | (column < -FLOAT_EXACT_LIMIT)
+    return not out_of_range.any()
+
+def exact_objects(column):
+    """
+    Convert a column to Python objects that compare like the values they hold
+    Returns an object Series with None for missing values
+    """
+    values = column.to_numpy(dtype=object, na_value=None)
+    
+    # Booleans and whole floats become ints so they hash and compare like
+    # integers, as Python's True == 1 == 1.0
+    return pd.Series(
+        [
+            int(v) if isinstance(v, bool) or (
+                isinstance(v, float) and v.is_integer()
+            ) else v
+            for v in values
+        ],
+        index=column.index,
+        dtype=object,
+    )
+
+def align_columns(column1, column2):
+    """
+    Convert two same-position columns of different dtypes to a shared form
+    Returns the two aligned columns
+    """
+    dtype1, dtype2 = column1.dtype, column2.dtype
+    
+    # Numbers compare by value, like Python's True == 1 == 1.0, but only
+    # while the integers fit in float64 without rounding
+    if (
+        is_number_dtype(dtype1)
+        and is_number_dtype(dtype2)
+        and fits_float(column1)
+        and fits_float(column2)
+    ):
+        if isinstance(dtype1, pd.ArrowDtype) or isinstance(dtype2, pd.ArrowDtype):
+            dtype = pd.ArrowDtype(pa.float64())
+        else:
+            dtype = np.dtype('float64')
+        return column1.astype(dtype), column2.astype(dtype)
+    
+    # Anything else is compared exactly as Python objects
+    return exact_objects(column1), exact_objects(column2)
+
+def align_dtypes(df1, df2):
+    """
+    Bring same-position columns of two DataFrames to a shared dtype
+    Returns the two aligned dataframes
+    """
+    aligned1, aligned2 = df1, df2
+    if len(df1.columns) != len(df2.columns):
+        return aligned1, aligned2
+    
+    for i, (dtype1, dtype2) in enumerate(zip(df1.dtypes, df2.dtypes)):
+        if dtype1 == dtype2:
+            continue
+        if aligned1 is df1:
+            aligned1, aligned2 = df1.copy(deep=False), df2.copy(deep=False)
+        column1, column2 = align_columns(df1.iloc[:, i], df2.iloc[:, i])
+        aligned1.isetitem(i, column1)
+        aligned2.isetitem(i, column2)
+    
+    return aligned1, aligned2
+
+def hashes_in(values, sorted_reference):
+    """
+    Check which hashes appear in an already sorted reference array
+    Returns a boolean mask over values
+    """
+    if len(sorted_reference) == 0:
+        return np.zeros(len(values), dtype=bool)
+    
+    # Binary search each value, clamping past-the-end positions
+    positions = np.searchsorted(sorted_reference, values)
+    positions = np.minimum(positions, len(sorted_reference) - 1)
+    return sorted_reference[positions] == values
+
+def confirm_matches(df, other, candidates, other_candidates):
+    """
+    Check which candidate rows of df really exist in other
+    Only rows flagged in other_candidates are compared against
+    Returns a boolean mask over the rows of df
+    """
+    found = np.zeros(len(df), dtype=bool)
+    if not candidates.any() or len(df.columns) != len(other.columns):
+        return found
+    
+    # Compare by position so differently named columns still line up
+    keys = list(range(len(df.columns)))
+    left = df[candidates].set_axis(keys, axis=1)
+    right = other[other_candidates].set_axis(keys, axis=1).drop_duplicates()
+    merged = left.merge(right, how='left', on=keys, indicator=True)
+    
+    found[candidates] = (merged['_merge'] == 'both').to_numpy()
+    return found
+
+def duplicated_rows(df, hashes):
+    """
+    Flag repeated rows of df using their precomputed row hashes
+    Returns a boolean mask marking every repeat after the first occurrence
+    """
+    # Only rows with a repeated hash can be duplicates, so check those exactly
+    candidates = pd.Series(hashes).duplicated(keep=False).to_numpy()
+    duplicated = np.zeros(len(df), dtype=bool)
+    if candidates.any():
+        duplicated[candidates] = df[candidates].duplicated().to_numpy()
+    return duplicated
+
+def find_unique_records(df1, df2, hashes1=None, hashes2=None, aligned=None):
     """
     Find records that are in df1 but not in df2 and vice versa
+    The dtype-aligned frames and their row hashes can be passed in
     Returns two dataframes: unique_in_df1, unique_in_df2
     """
-    # Convert dataframes to sets of tuples for comparison
-    df1_records = set(df1.apply(tuple, axis=1))
-    df2_records = set(df2.apply(tuple, axis=1))
+    # Compare in shared dtypes so equal values like 1 and 1.0 hash alike
+    if aligned is None:
+        aligned = align_dtypes(df1, df2)
+    aligned1, aligned2 = aligned
+    
+    # Hash each row once so membership tests run on plain integer arrays
+    if hashes1 is None:
+        hashes1 = row_hashes(aligned1)
+    if hashes2 is None:
+        hashes2 = row_hashes(aligned2)
+    
+    # Duplicates within a file would only be compared again, collapse them
+    keep1 = ~duplicated_rows(aligned1, hashes1)
+    keep2 = ~duplicated_rows(aligned2, hashes2)
+    df1, aligned1, hashes1 = df1[keep1], aligned1[keep1], hashes1[keep1]
+    df2, aligned2, hashes2 = df2[keep2], aligned2[keep2], hashes2[keep2]
+    
+    # A matching hash only means the row is probably shared, so confirm it
+    # against the few rows of the other file that share a hash
+    shared1 = hashes_in(hashes1, np.sort(hashes2))
+    
+    # Hashes common to both files are exactly those hit above, so the second
+    # side only has to search that (usually small) sorted set
+    shared2 = hashes_in(hashes2, np.unique(hashes1[shared1]))
     
-    # Find unique records
-    unique_in_df1 = df1_records - df2_records
-    unique_in_df2 = df2_records - df1_records
+    # The exact checks for both sides are independent, so run them together
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future1 = executor.submit(
+            confirm_matches, aligned1, aligned2, shared1, shared2
+        )
+        future2 = executor.submit(
+            confirm_matches, aligned2, aligned1, shared2, shared1
+        )
+        found1, found2 = future1.result(), future2.result()
     
-    # Convert back to dataframes
-    unique_df1 = pd.DataFrame(list(unique_in_df1), columns=df1.columns)
-    unique_df2 = pd.DataFrame(list(unique_in_df2), columns=df2.columns)
+    # Select from the original frames to keep their dtypes
+    unique_df1 = df1[~found1].reset_index(drop=True)
+    unique_df2 = df2[~found2].reset_index(drop=True)
     
     return unique_df1, unique_df2
 
+def file_digest(data):
+    """
+    Hash uploaded file contents for use as a cache key
+    Returns the BLAKE2b digest as bytes
+    """
+    return hashlib.blake2b(data).digest()
+
+def session_cache_dir():
+    """
+    Get this session's temporary directory for Parquet copies of uploads
+    The directory is removed once the session ends
+    """
+    if 'cache_dir' not in st.session_state:
+        st.session_state.cache_dir = tempfile.TemporaryDirectory(
+            prefix='duplicates-'
+        )
+    return Path(st.session_state.cache_dir.name)
+
+@st.cache_data(show_spinner=False, max_entries=MAX_CACHED_FILES)
+def load_csv(digest, _data, sep, skiprows, _cache_dir):
+    """
+    Parse uploaded file contents, cached by their digest
+    A Parquet copy in _cache_dir lets evicted entries skip the CSV parse
+    Returns DataFrame and error message (if any)
+    """
+    key = hashlib.blake2b(repr((digest, sep, skiprows)).encode(), digest_size=16)
+    path = _cache_dir / f"{key.hexdigest()}.parquet"
+    if path.exists():
+        return pd.read_parquet(path, dtype_backend='pyarrow'), None
+    
+    df, error = read_csv_safely(io.BytesIO(_data), sep=sep, skiprows=skiprows)
+    if error is None:
+        # The Parquet copy is only a cache, never fail the upload over it
+        try:
+            df.to_parquet(path, index=False)
+        except (OSError, pa.ArrowException):
+            path.unlink(missing_ok=True)
+    return df, error
+
+def schema(df):
+    """
+    Describe the column names and dtypes of a DataFrame
+    Returns a hashable tuple of (name, dtype) pairs
+    """
+    return tuple((name, str(dtype)) for name, dtype in df.dtypes.items())
+
+@st.cache_data(show_spinner=False, max_entries=MAX_CACHED_FILES)
+def load_row_hashes(digest, sep, skiprows, column_schema, _df):
+    """
+    Hash the rows of a parsed file, cached by its digest and column schema
+    Returns a numpy array with one hash per row
+    """
+    return row_hashes(_df)
+
+@st.cache_data(show_spinner=False, max_entries=MAX_CACHED_FILES)
+def compare_files(digest1, digest2, sep, skiprows, _df1, _df2):
+    """
+    Find unique records of two parsed files, cached by their digests
+    Returns two dataframes: unique_in_df1, unique_in_df2
+    """
+    # Identical uploads cannot have unique records, skip the comparison
+    if digest1 == digest2:
+        return _df1.iloc[0:0], _df2.iloc[0:0]
+    
+    # Reuse each file's row hashes across comparisons with other files, as
+    # long as the columns are hashed in the same order and dtypes
+    aligned1, aligned2 = align_dtypes(_df1, _df2)
+    hashes1 = load_row_hashes(digest1, sep, skiprows, schema(aligned1), aligned1)
+    hashes2 = load_row_hashes(digest2, sep, skiprows, schema(aligned2), aligned2)
+    return find_unique_records(
+        _df1, _df2, hashes1, hashes2, aligned=(aligned1, aligned2)
+    )
+
+def combine_records(unique_df1, unique_df2):
+    """
+    Stack the unique records of both files into one DataFrame
+    Returns the combined dataframe
+    """
+    # No deduplication needed: each side is already free of repeated rows, and
+    # a row unique to one file can never be unique to the other as well
+    
+    # Only copy column buffers when both sides actually have rows
+    if len(unique_df2) == 0:
+        return unique_df1
+    if len(unique_df1) == 0:
+        return unique_df2
+    return pd.concat([unique_df1, unique_df2], ignore_index=True)
+
+def to_csv_bytes(df):
+    """
+    Serialize a DataFrame to CSV for download
+    Returns the encoded CSV as bytes
+    """
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False, encoding='utf-8')
+    return buffer.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=MAX_CACHED_FILES)
+def results_csv(comparison_key, part, _df):
+    """
+    Serialize one part of a comparison's results, cached by the comparison
+    Returns the encoded CSV as bytes
+    """
+    return to_csv_bytes(_df)
+
+def show_preview(df, max_rows=PREVIEW_ROWS):
+    """
+    Display at most max_rows of a DataFrame
+    The full data is only available through the download buttons
+    """
+    st.dataframe(df.head(max_rows))
+    if len(df) > max_rows:
+        st.caption(
+            f"Showing first {max_rows} of {len(df)} rows — download for the full set"
+        )
+
 def main():
     st.title("CSV File Comparison Tool")
     st.write("Upload two CSV files to find unique records in each file.")
     
     # Add CSV parsing options
     st.sidebar.header("CSV Parsing Options")
-    delimiter = st.sidebar.text_input("Delimiter", ",")
+    delimiter = st.sidebar.text_input(
+        "Delimiter", ",", help="Leave empty to detect it automatically"
+    )
     skip_rows = st.sidebar.number_input("Skip Rows", 0)
     
     # File uploaders
@@ -70,22 +408,24 @@ def main():
     
     if file1 and file2:
         # Read CSV files with error handling
-        df1, error1 = read_csv_safely(file1, sep=delimiter, skiprows=skip_rows)
+        data1, data2 = file1.getvalue(), file2.getvalue()
+        digest1, digest2 = file_digest(data1), file_digest(data2)
+        cache_dir = session_cache_dir()
+        
+        df1, error1 = load_csv(digest1, data1, delimiter, skip_rows, cache_dir)
         if error1:
             st.error(f"Error reading first file: {error1}")
             # Display first few lines of the file for debugging
-            file1.seek(0)
             st.text("First few lines of file 1:")
-            st.code(file1.read().decode('utf-8')[:500])
+            st.code(data1[:512].decode('utf-8', errors='replace'))
             return
             
-        df2, error2 = read_csv_safely(file2, sep=delimiter, skiprows=skip_rows)
+        df2, error2 = load_csv(digest2, data2, delimiter, skip_rows, cache_dir)
         if error2:
             st.error(f"Error reading second file: {error2}")
             # Display first few lines of the file for debugging
-            file2.seek(0)
             st.text("First few lines of file 2:")
-            st.code(file2.read().decode('utf-8')[:500])
+            st.code(data2[:512].decode('utf-8', errors='replace'))
             return
         
         # Display file information
@@ -114,33 +454,46 @@ def main():
             st.write("Second File:")
             st.dataframe(df2.head())
         
-        # Check if columns match
-        if set(df1.columns) != set(df2.columns):
-            st.warning("Warning: The columns in both files don't match!")
-            # Option to proceed anyway
-            if not st.checkbox("Proceed with comparison anyway"):
-                return
+        # Check if columns match, in order, since records are compared by position
+        if tuple(df1.columns) != tuple(df2.columns):
+            if set(df1.columns) == set(df2.columns):
+                # Same columns in another order, line them up with the first file
+                df2 = df2[df1.columns]
+                st.info("Columns of the second file were reordered to match the first.")
+            else:
+                st.warning("Warning: The columns in both files don't match!")
+                # Option to proceed anyway
+                if not st.checkbox("Proceed with comparison anyway"):
+                    return
         
-        # Compare files
+        # Compare files, keeping the results for later reruns
+        comparison_key = (digest1, digest2, delimiter, skip_rows)
         if st.button("Compare Files"):
-            unique_df1, unique_df2 = find_unique_records(df1, df2)
+            st.session_state.comparison = comparison_key, compare_files(
+                digest1, digest2, delimiter, skip_rows, df1, df2
+            )
+        
+        comparison = st.session_state.get('comparison')
+        if comparison is not None and comparison[0] == comparison_key:
+            unique_df1, unique_df2 = comparison[1]
             
             st.write("### Results")
             st.write(f"Records unique to first file: {len(unique_df1)}")
             st.write(f"Records unique to second file: {len(unique_df2)}")
+            st.caption("Duplicate records within a file are collapsed.")
             
             # Display unique records
             if len(unique_df1) > 0:
                 st.write("#### Unique records in first file:")
-                st.dataframe(unique_df1)
+                show_preview(unique_df1)
             
             if len(unique_df2) > 0:
                 st.write("#### Unique records in second file:")
-                st.dataframe(unique_df2)
+                show_preview(unique_df2)
             
             # Download buttons for unique records
             if len(unique_df1) > 0:
-                csv1 = unique_df1.to_csv(index=False)
+                csv1 = results_csv(comparison_key, 'file1', unique_df1)
                 st.download_button(
                     label="Download unique records from first file",
                     data=csv1,
@@ -149,7 +502,7 @@ def main():
                 )
             
             if len(unique_df2) > 0:
-                csv2 = unique_df2.to_csv(index=False)
+                csv2 = results_csv(comparison_key, 'file2', unique_df2)
                 st.download_button(
                     label="Download unique records from second file",
                     data=csv2,
@@ -159,12 +512,14 @@ def main():
             
             # Combined unique records
             if st.button("Combine unique records"):
-                combined_unique = pd.concat([unique_df1, unique_df2], ignore_index=True)
+                combined_unique = combine_records(unique_df1, unique_df2)
                 st.write("#### Combined unique records:")
-                st.dataframe(combined_unique)
+                show_preview(combined_unique)
                 
                 # Download combined unique records
-                csv_combined = combined_unique.to_csv(index=False)
+                csv_combined = results_csv(
+                    comparison_key, 'combined', combined_unique
+                )
                 st.download_button(
                     label="Download combined unique records",
                     data=csv_combined,
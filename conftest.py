@@ -0,0 +1 @@
+# Lets pytest import app.py from the repository root
@@ -0,0 +1,230 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+import app
+from app import (
+    align_dtypes,
+    combine_records,
+    compare_files,
+    duplicated_rows,
+    file_digest,
+    find_unique_records,
+    hashes_in,
+    load_csv,
+    read_csv_safely,
+    results_csv,
+)
+
+
+def test_int_and_float_columns_compare_by_value():
+    df1 = pd.DataFrame({'p': [10, 20]})
+    df2 = pd.DataFrame({'p': [10.0, 20.5]})
+
+    unique_df1, unique_df2 = find_unique_records(df1, df2)
+
+    assert unique_df1['p'].tolist() == [20]
+    assert unique_df2['p'].tolist() == [20.5]
+
+
+def test_unique_records_keep_original_dtypes():
+    df1 = pd.DataFrame({'id': [1, 2], 'name': ['x', 'y']})
+    df2 = pd.DataFrame({'id': [1.0, None], 'name': ['x', 'z']})
+
+    unique_df1, unique_df2 = find_unique_records(df1, df2)
+
+    assert unique_df1.to_dict('list') == {'id': [2], 'name': ['y']}
+    assert unique_df1['id'].dtype == 'int64'
+    assert unique_df2['name'].tolist() == ['z']
+
+
+def parse(text, **kwargs):
+    return read_csv_safely(io.BytesIO(text), sep=',', **kwargs)
+
+
+def test_skip_rows_is_honoured():
+    df, error = parse(b'junk\na,b\n1,2', skiprows=1)
+
+    assert error is None
+    assert df.columns.tolist() == ['a', 'b']
+    assert df.values.tolist() == [[1, 2]]
+
+
+def test_dates_parse_the_same_with_a_bad_value():
+    df1, _ = parse(b'd,v\n2024-01-01,1\n2024-01-02,2')
+    df2, _ = parse(b'd,v\n2024-01-01,1\nnot a date,3')
+
+    unique_df1, unique_df2 = find_unique_records(df1, df2)
+
+    assert df1.dtypes.tolist() == df2.dtypes.tolist()
+    assert unique_df1['v'].tolist() == [2]
+    assert unique_df2['v'].tolist() == [3]
+
+
+def test_invalid_utf8_is_reported():
+    df, error = parse(b'a\n\xe9')
+
+    assert df is None
+    assert error
+
+
+def test_blank_in_arrow_column_does_not_change_other_hashes():
+    df1, _ = parse(b'id,name\n1,x\n2,y')
+    df2, _ = parse(b'id,name\n1,x\n,z')
+
+    unique_df1, unique_df2 = find_unique_records(df1, df2)
+
+    assert unique_df1['name'].tolist() == ['y']
+    assert unique_df2['name'].tolist() == ['z']
+
+
+def test_blank_in_arrow_bool_column():
+    df1, _ = parse(b'f,g\ntrue,1\nfalse,2')
+    df2, _ = parse(b'f,g\ntrue,1\n,3')
+
+    unique_df1, unique_df2 = find_unique_records(df1, df2)
+
+    assert unique_df1['g'].tolist() == [2]
+    assert unique_df2['g'].tolist() == [3]
+
+
+def test_parsed_upload_is_reloaded_from_parquet(tmp_path):
+    data = b'id,name\n1,x\n,z'
+    digest = file_digest(data)
+    df, error = load_csv(digest, data, ',', 0, tmp_path)
+
+    # Evict the in-memory entry so the Parquet copy is used
+    load_csv.clear()
+    reloaded, _ = load_csv(digest, b'', ',', 0, tmp_path)
+
+    assert error is None
+    assert len(list(tmp_path.glob('*.parquet'))) == 1
+    pd.testing.assert_frame_equal(reloaded, df)
+
+
+def test_combined_unique_records_have_no_repeats():
+    df1, _ = parse(b'id,name\n1,x\n2,y\n2,y')
+    df2, _ = parse(b'id,name\n1.0,x\n,z')
+
+    combined = combine_records(*find_unique_records(df1, df2))
+
+    assert combined['name'].tolist() == ['y', 'z']
+
+
+def test_large_integers_are_not_rounded_to_match_floats():
+    df1, _ = parse(b'a\n9007199254740993\n9007199254740992')
+    df2, _ = parse(b'a\n9007199254740992.0\n1.5')
+
+    unique_df1, unique_df2 = find_unique_records(df1, df2)
+
+    assert unique_df1['a'].tolist() == [9007199254740993]
+    assert unique_df2['a'].tolist() == [1.5]
+
+
+def test_large_integers_on_numpy_columns():
+    df1 = pd.DataFrame({'a': [2 ** 53 + 1, 7]})
+    df2 = pd.DataFrame({'a': [float(2 ** 53), 7.0]})
+
+    unique_df1, unique_df2 = find_unique_records(df1, df2)
+
+    assert unique_df1['a'].tolist() == [2 ** 53 + 1]
+    assert unique_df2['a'].tolist() == [float(2 ** 53)]
+
+
+def test_bool_and_int_columns_compare_by_value():
+    df1, _ = parse(b'f,g\ntrue,1\nfalse,2')
+    df2, _ = parse(b'f,g\n1,1\n5,3')
+
+    unique_df1, unique_df2 = find_unique_records(df1, df2)
+
+    assert unique_df1['g'].tolist() == [2]
+    assert unique_df2['g'].tolist() == [3]
+
+
+def test_compare_files_aligns_dtypes_once(monkeypatch):
+    df1 = pd.DataFrame({'p': [10, 20]})
+    df2 = pd.DataFrame({'p': [10.0, 20.5]})
+    calls = []
+
+    def counting_align_dtypes(*frames):
+        calls.append(frames)
+        return align_dtypes(*frames)
+
+    monkeypatch.setattr(app, 'align_dtypes', counting_align_dtypes)
+
+    unique_df1, unique_df2 = compare_files(b'1', b'2', ',', 0, df1, df2)
+
+    assert len(calls) == 1
+    assert unique_df1['p'].tolist() == [20]
+    assert unique_df2['p'].tolist() == [20.5]
+
+
+def test_results_csv_is_cached_per_comparison():
+    df = pd.DataFrame({'a': [1, 2]})
+
+    first = results_csv(('key',), 'file1', df)
+    again = results_csv(('key',), 'file1', df.iloc[0:0])
+
+    assert first == b'a\n1\n2\n'
+    assert again == first
+
+
+def test_failed_parquet_write_still_returns_the_parse(tmp_path):
+    data = b'a\n1'
+    missing_dir = tmp_path / 'removed'
+
+    df, error = load_csv(file_digest(data), data, ',', 0, missing_dir)
+
+    assert error is None
+    assert df['a'].tolist() == [1]
+
+
+def test_sniffing_skips_the_preamble():
+    df, error = read_csv_safely(
+        io.BytesIO(b'junk line here\na;b\n1;2'), sep='', skiprows=1
+    )
+
+    assert error is None
+    assert df.columns.tolist() == ['a', 'b']
+    assert df.values.tolist() == [[1, 2]]
+
+
+def test_hashes_in_empty_reference():
+    values = np.array([1, 2], dtype=np.uint64)
+
+    found = hashes_in(values, np.array([], dtype=np.uint64))
+
+    assert found.tolist() == [False, False]
+
+
+def test_hashes_in_values_past_the_end():
+    reference = np.array([10, 20], dtype=np.uint64)
+    values = np.array([5, 20, 25, 10], dtype=np.uint64)
+
+    assert hashes_in(values, reference).tolist() == [False, True, False, True]
+
+
+def test_duplicated_rows_checks_colliding_hashes_exactly():
+    df = pd.DataFrame({'a': [1, 2, 1, 3]})
+    colliding = np.zeros(len(df), dtype=np.uint64)
+
+    assert duplicated_rows(df, colliding).tolist() == [False, False, True, False]
+
+
+def test_identical_uploads_skip_the_comparison(monkeypatch):
+    df = pd.DataFrame({'a': [1, 2]})
+    monkeypatch.setattr(app, 'find_unique_records', None)
+
+    unique_df1, unique_df2 = compare_files(b'same', b'same', ',', 0, df, df)
+
+    assert len(unique_df1) == 0 and len(unique_df2) == 0
+    assert unique_df1.columns.tolist() == ['a']
+
+
+def test_blank_delimiter_is_sniffed():
+    df, error = read_csv_safely(io.BytesIO(b'a;b\n1;2\n3;4'), sep='')
+
+    assert error is None
+    assert df.columns.tolist() == ['a', 'b']
+    assert df.values.tolist() == [[1, 2], [3, 4]]